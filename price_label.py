@@ -3,11 +3,47 @@
 Label Generator - Creates product labels from EAN codes
 """
 import argparse
+import asyncio
+import collections
+import functools
+import json
+import os
+import re
+import string
+import threading
+import time
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from PIL import Image, ImageDraw, ImageFont
-import barcode
-from barcode.writer import ImageWriter
-from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor, wait
+
+try:
+    # Optional, parses the API responses several times faster than json
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+try:
+    # Optional, used for concurrent per-product lookups
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+DPI = 8  # dots per mm
+
+# Label layout, converted from mm to pixels once
+_HEIGHT_PX = 48 * DPI
+_PADDING_LEFT_PX = 5 * DPI
+_PADDING_PX = 3 * DPI  # internal padding
+_LINE_GAP_PX = 1 * DPI  # gap between text lines
+_FONT_LARGE_PX = 5 * DPI
+_FONT_PRICE_PX = 12 * DPI
+_BARCODE_WIDTH_PX = 30 * DPI
+_BARCODE_HEIGHT_PX = 10 * DPI
 
 
 def format_price(price_minor_units, template='${price}'):
@@ -27,32 +63,166 @@ def format_price(price_minor_units, template='${price}'):
         return template.format(maj=maj, min=f"{min_units:02d}", price=price_str)
 
 
-def fetch_product_info(ean_code, language='world'):
-    """Fetch product information from Open Food Facts API
+@functools.lru_cache(maxsize=32)
+def compile_price_format(template='${price}'):
+    """Compile a price template into a function of price_minor_units
 
-    Args:
-        ean_code: EAN product code
-        language: Language or domain prefix (e.g., 'en', 'pl', or 'world')
+    Templates whose only placeholder is a plain {price} are split once into
+    the text before and after it, so formatting a price is a single f-string.
+    Any other template falls back to format_price().
     """
-    # Build domain based on requested language. Use 'world' for global dataset.
-    if language and language != 'world':
-        domain = f"{language}.openfoodfacts.org"
-    else:
-        domain = "world.openfoodfacts.org"
-
-    url = f"https://{domain}/api/v0/product/{ean_code}.json"
-    response = requests.get(url)
-    
-    if response.status_code != 200:
-        raise Exception(f"Failed to fetch product info: HTTP {response.status_code}")
+    split = _split_price_template(template)
+    if split is None:
+        return lambda price_minor_units: format_price(price_minor_units, template)
     
-    data = response.json()
+    prefix, suffix = split
     
-    if data.get('status') != 1:
-        raise Exception(f"Product not found for EAN: {ean_code}")
-    
-    product = data.get('product', {})
+    def price_text(price_minor_units):
+        return f"{prefix}{price_minor_units // 100}.{price_minor_units % 100:02d}{suffix}"
     
+    return price_text
+
+
+def format_prices(prices_minor_units, template='${price}'):
+    """Format many prices from minor units at once
+
+    Plain {price} templates are formatted with NumPy string operations on
+    the whole array; any other template, or prices that don't fit in int64,
+    are formatted price by price.
+
+    Returns:
+        List of formatted prices, in the same order as `prices_minor_units`
+    """
+    prices_minor_units = list(prices_minor_units)
+    split = _split_price_template(template)
+    try:
+        prices = np.asarray(prices_minor_units, dtype=np.int64)
+    except OverflowError:
+        split = None
+    if split is None or not prices_minor_units:
+        price_text = compile_price_format(template)
+        return [price_text(int(price)) for price in prices_minor_units]
+    
+    prefix, suffix = split
+    maj, min_units = np.divmod(prices, 100)
+    text = np.char.add(np.char.add(maj.astype(str), '.'), np.char.zfill(min_units.astype(str), 2))
+    return np.char.add(np.char.add(prefix, text), suffix).tolist()
+
+
+def _split_price_template(template):
+    """Split a template whose only placeholder is a plain {price}
+
+    Returns:
+        Tuple of (text before, text after) the placeholder, or None if the
+        template uses anything else
+    """
+    try:
+        parts = list(string.Formatter().parse(template))
+    except ValueError:
+        return None
+    
+    fields = [(name, spec, conversion) for _, name, spec, conversion in parts if name is not None]
+    if fields != [('price', '', None)]:
+        return None
+    
+    index = next(i for i, (_, name, _, _) in enumerate(parts) if name is not None)
+    prefix = ''.join(literal for literal, *_ in parts[:index + 1])
+    suffix = ''.join(literal for literal, *_ in parts[index + 1:])
+    return prefix, suffix
+
+# EAN-13 'L' digit patterns; 'R' patterns are their complement and 'G'
+# patterns are 'R' reversed
+_EAN_L = np.array([[int(bit) for bit in pattern] for pattern in (
+    '0001101', '0011001', '0010011', '0111101', '0100011',
+    '0110001', '0101111', '0111011', '0110111', '0001011',
+)], dtype=np.uint8)
+_EAN_R = 1 - _EAN_L
+_EAN_G = _EAN_R[:, ::-1]
+
+# G parity of the six left-half digits, selected by the first digit
+_EAN_PARITY = np.array([[parity == 'G' for parity in pattern] for pattern in (
+    'LLLLLL', 'LLGLGG', 'LLGGLG', 'LLGGGL', 'LGLLGG',
+    'LGGLLG', 'LGGGLL', 'LGLGLG', 'LGLGGL', 'LGGLGL',
+)])
+
+_EAN_GUARD = np.array([1, 0, 1], dtype=np.uint8)
+_EAN_CENTER = np.array([0, 1, 0, 1, 0], dtype=np.uint8)
+_EAN_WEIGHTS = np.array([1, 3] * 6, dtype=np.int64)
+_EAN_RE = re.compile(r'[0-9]{13}')
+_PRICE_RE = re.compile(r'[0-9]+')
+
+# Background PNG encoding for create_labels(). At most _MAX_PENDING_SAVES
+# rendered labels wait for encoding, so memory stays bounded when saving is
+# slower than rendering.
+_SAVE_WORKERS = 2
+_SAVE_POOL = ThreadPoolExecutor(max_workers=_SAVE_WORKERS)
+_MAX_PENDING_SAVES = 2 * _SAVE_WORKERS
+
+# Most recently released label images, reused by _acquire_canvas(). Label
+# width varies with the text, so the pool is capped across all sizes and
+# the oldest image is dropped first. Saves finish on other threads, so this
+# is a locked pool rather than thread-local.
+_CANVAS_POOL_SIZE = 4
+_CANVASES = collections.deque(maxlen=_CANVAS_POOL_SIZE)
+_CANVAS_LOCK = threading.Lock()
+
+# Label fonts in order of preference; the first one present is used
+_FONT_PATHS = (
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+    "/usr/share/fonts/dejavu/DejaVuSans-Bold.ttf",
+    "/usr/share/fonts/truetype/msttcorefonts/arialbd.ttf",
+    "/usr/share/fonts/truetype/msttcorefonts/Arial_Bold.ttf",
+    "/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf",
+    "/usr/share/fonts/liberation-sans/LiberationSans-Bold.ttf",
+    "/System/Library/Fonts/Supplemental/Arial Bold.ttf",
+    os.path.join(os.environ.get('WINDIR', 'C:/Windows'), 'Fonts', 'arialbd.ttf'),
+    os.path.join(os.environ.get('WINDIR', 'C:/Windows'), 'Fonts', 'arial.ttf'),
+)
+_FONT_PATH = next((path for path in _FONT_PATHS if os.path.exists(path)), None)
+
+# Maximum number of EAN codes sent in a single search request
+_BATCH_SIZE = 100
+
+# On-disk cache of product lookups, keyed by language and EAN code
+CACHE_DIR = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'price_label')
+CACHE_TTL = 7 * 24 * 60 * 60  # seconds
+# Languages and EAN codes must match this to be used in cache file names
+_CACHE_KEY_RE = re.compile(r'[A-Za-z0-9-]+')
+
+# Only the product fields used on labels are requested from the API
+_PRODUCT_FIELDS = 'code,product_name,brands'
+
+# (connect, read) timeout in seconds for Open Food Facts requests
+_TIMEOUT = (3.05, 10)
+
+_USER_AGENT = 'price-label-app/1.0 (https://github.com/wiktorpyk/price-label-app)'
+
+# Limits for fetch_product_infos_async(): concurrent connections and seconds
+# between request starts, keeping well under the 100 product reads/minute
+# allowed by the Open Food Facts API
+_ASYNC_CONNECTIONS = 4
+_ASYNC_REQUEST_INTERVAL = 1.0
+
+# Shared session so consecutive lookups reuse one keep-alive connection
+_SESSION = requests.Session()
+_SESSION.headers['User-Agent'] = _USER_AGENT
+_SESSION.mount('https://', HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=16,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=(500, 502, 503, 504)),
+))
+
+
+def _domain(language):
+    """Return the Open Food Facts domain for a language or domain prefix"""
+    # Build domain based on requested language. Use 'world' for global dataset.
+    if language and language != 'world':
+        return f"{language}.openfoodfacts.org"
+    return "world.openfoodfacts.org"
+
+
+def _product_info(product, ean_code):
+    """Build the product info dict used for labels from an API product record"""
     return {
         'name': product.get('product_name', 'Unknown Product'),
         'producer': product.get('brands', 'Unknown Brand'),
@@ -60,37 +230,298 @@ def fetch_product_info(ean_code, language='world'):
     }
 
 
-def generate_barcode_image(ean_code):
+def _cache_path(ean_code, language):
+    """Return the on-disk cache file for a product lookup
+
+    Returns None if the language or EAN code is not safe to use in a file
+    name, in which case the lookup is not cached.
+    """
+    language = language or 'world'
+    if not (_CACHE_KEY_RE.fullmatch(language) and _CACHE_KEY_RE.fullmatch(str(ean_code))):
+        return None
+    return os.path.join(CACHE_DIR, f"{language}_{ean_code}.json")
+
+
+def _cache_get(ean_code, language):
+    """Return a cached product record, or None if missing or expired"""
+    path = _cache_path(ean_code, language)
+    if path is None:
+        return None
+    
+    try:
+        with open(path, 'rb') as f:
+            entry = _json_loads(f.read())
+    except (OSError, ValueError):
+        return None
+    
+    if not isinstance(entry, dict):
+        return None
+    fetched = entry.get('fetched')
+    if not isinstance(fetched, (int, float)) or time.time() - fetched > CACHE_TTL:
+        return None
+    product = entry.get('product')
+    return product if isinstance(product, dict) else None
+
+
+def _cache_put(ean_code, language, product):
+    """Store a product record in the on-disk cache, ignoring I/O errors"""
+    path = _cache_path(ean_code, language)
+    if path is None:
+        return
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'fetched': time.time(), 'product': product}, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+
+
+class _SearchUnavailable(Exception):
+    """The search endpoint is rate limiting us or temporarily failing"""
+
+
+def _search_products(ean_codes, language='world'):
+    """Look up several EAN codes with the Open Food Facts search endpoint
+
+    Products found in the on-disk cache are not requested again.
+
+    Returns:
+        Dict mapping EAN code to the raw product record for every code found
+    """
+    products = {}
+    codes = []
+    for ean in dict.fromkeys(ean_codes):
+        product = _cache_get(ean, language)
+        if product is None:
+            codes.append(ean)
+        else:
+            products[ean] = product
+    
+    url = f"https://{_domain(language)}/api/v2/search"
+
+    for start in range(0, len(codes), _BATCH_SIZE):
+        chunk = codes[start:start + _BATCH_SIZE]
+        try:
+            response = _SESSION.get(url, params={
+                'code': ','.join(chunk),
+                'fields': _PRODUCT_FIELDS,
+                'page_size': len(chunk),
+            }, timeout=_TIMEOUT)
+        except requests.exceptions.RetryError as e:
+            # 5xx responses that persisted through the adapter's retries
+            raise _SearchUnavailable(f"Product search unavailable: {e}") from e
+
+        if response.status_code == 429:
+            raise _SearchUnavailable("Product search is rate limited: HTTP 429")
+        if response.status_code != 200:
+            raise Exception(f"Failed to fetch product info: HTTP {response.status_code}")
+
+        for product in _json_loads(response.content).get('products', []):
+            code = product.get('code')
+            if code:
+                products[code] = product
+                _cache_put(code, language, product)
+
+    return products
+
+
+def fetch_product_infos(ean_codes, language='world'):
+    """Fetch product information for several EAN codes at once
+
+    Args:
+        ean_codes: Iterable of EAN product codes
+        language: Language or domain prefix (e.g., 'en', 'pl', or 'world')
+
+    If the search endpoint is rate limited (HTTP 429) or keeps failing with
+    5xx errors, and aiohttp is installed, the products are looked up one by
+    one with fetch_product_infos_async() instead. That fallback uses
+    asyncio.run(), so it is skipped when called from a running event loop;
+    async code should call fetch_product_infos_async() directly.
+
+    Returns:
+        Dict keyed by EAN code. Codes not found in Open Food Facts get
+        'Unknown Product' / 'Unknown Brand' placeholders.
+    """
+    ean_codes = list(ean_codes)
+    try:
+        products = _search_products(ean_codes, language)
+    except _SearchUnavailable as search_error:
+        if aiohttp is None or _in_event_loop():
+            raise
+        # Search is rate limited much harder than product reads, so fall
+        # back to throttled per-product lookups
+        print(f"Warning: {search_error}; looking up products one by one")
+        try:
+            return asyncio.run(fetch_product_infos_async(ean_codes, language))
+        except Exception as e:
+            raise Exception(f"{search_error}; per-product lookups also failed: {e}") from e
+    return {ean: _product_info(products.get(ean, {}), ean) for ean in ean_codes}
+
+
+def _in_event_loop():
+    """Return True if called from a thread with a running asyncio loop"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+async def fetch_product_infos_async(ean_codes, language='world'):
+    """Fetch product information for several EAN codes concurrently
+
+    Each code missing from the on-disk cache is looked up with its own
+    request on a single event loop thread, sharing pooled connections.
+    Request starts are spaced _ASYNC_REQUEST_INTERVAL apart to stay under
+    the API rate limit. Requires aiohttp.
+
+    Args:
+        ean_codes: Iterable of EAN product codes
+        language: Language or domain prefix (e.g., 'en', 'pl', or 'world')
+
+    Returns:
+        Dict keyed by EAN code, like fetch_product_infos()
+    """
+    if aiohttp is None:
+        raise RuntimeError("fetch_product_infos_async() requires aiohttp")
+
+    ean_codes = list(ean_codes)
+    products = {}
+    missing = []
+    for ean in dict.fromkeys(ean_codes):
+        product = _cache_get(ean, language)
+        if product is None:
+            missing.append(ean)
+        else:
+            products[ean] = product
+
+    if missing:
+        timeout = aiohttp.ClientTimeout(sock_connect=_TIMEOUT[0], sock_read=_TIMEOUT[1])
+        connector = aiohttp.TCPConnector(limit=_ASYNC_CONNECTIONS)
+
+        async with aiohttp.ClientSession(headers={'User-Agent': _USER_AGENT}, timeout=timeout,
+                                         connector=connector) as session:
+            found = await asyncio.gather(*(
+                _fetch_product_async(session, ean, language, delay=index * _ASYNC_REQUEST_INTERVAL)
+                for index, ean in enumerate(missing)
+            ))
+        products.update(zip(missing, found))
+
+    return {ean: _product_info(products[ean] or {}, ean) for ean in ean_codes}
+
+
+async def _fetch_product_async(session, ean_code, language, delay=0):
+    """Look up one product after `delay` seconds, or None if not found"""
+    await asyncio.sleep(delay)
+
+    async with session.get(_product_url(ean_code, language), params={'fields': _PRODUCT_FIELDS}) as response:
+        content = await response.read()
+    product = _parse_product_response(response.status, content)
+    if product is not None:
+        _cache_put(ean_code, language, product)
+
+    return product
+
+
+def _product_url(ean_code, language):
+    """Return the v2 API URL for a single product"""
+    return f"https://{_domain(language)}/api/v2/product/{ean_code}"
+
+
+def _parse_product_response(status_code, content):
+    """Extract the product record from a v2 product response
+
+    Returns:
+        The product record, or None if the product does not exist
+    """
+    # v2 answers 404 with status 0 for unknown products
+    if status_code not in (200, 404):
+        raise Exception(f"Failed to fetch product info: HTTP {status_code}")
+
+    data = _json_loads(content)
+
+    if data.get('status') not in (1, 'success'):
+        return None
+    return data.get('product', {})
+
+
+def fetch_product_info(ean_code, language='world'):
+    """Fetch product information from Open Food Facts API
+
+    Args:
+        ean_code: EAN product code
+        language: Language or domain prefix (e.g., 'en', 'pl', or 'world')
+    """
+    product = _cache_get(ean_code, language)
+
+    if product is None:
+        response = _SESSION.get(_product_url(ean_code, language), params={'fields': _PRODUCT_FIELDS},
+                                timeout=_TIMEOUT)
+        product = _parse_product_response(response.status_code, response.content)
+
+        if product is None:
+            raise Exception(f"Product not found for EAN: {ean_code}")
+
+        _cache_put(ean_code, language, product)
+
+    return _product_info(product, ean_code)
+
+
+def _ean13_check_digit(digits):
+    """Return the EAN-13 check digit for the first 12 digits of `digits`"""
+    return int(10 - (digits[:12] @ _EAN_WEIGHTS) % 10) % 10
+
+
+def is_valid_ean13(ean_code):
+    """Check that `ean_code` is 13 ASCII digits with a correct check digit"""
+    if not _EAN_RE.fullmatch(ean_code):
+        return False
+    digits = np.frombuffer(ean_code.encode('ascii'), dtype=np.uint8) - ord('0')
+    return _ean13_check_digit(digits) == int(digits[12])
+
+
+def generate_barcode_image(ean_code, width_px, height_px):
     """Generate a barcode image for the given EAN code
     
+    The barcode is rendered directly at the requested size with a whole
+    number of pixels per module, so the bars stay sharp and no resampling
+    is needed. Any leftover width goes into the quiet zones.
+    
     Args:
-        ean_code: EAN-13 barcode string
+        ean_code: EAN-13 barcode string (the check digit is recomputed)
+        width_px: Barcode width in pixels, including quiet zones
+        height_px: Barcode height in pixels
     
     Returns:
         PIL Image object containing the barcode
     """
-    from barcode import EAN13
+    if not (ean_code.isdigit() and len(ean_code) in (12, 13)):
+        raise ValueError(f"Invalid EAN-13 code: {ean_code}")
+    
+    # 95 modules of bars plus at least 11 modules of quiet zone on each side
+    module_px = max(1, width_px // (95 + 2 * 11))
     
-    # Create barcode with ImageWriter
-    ean = EAN13(ean_code, writer=ImageWriter())
+    digits = np.frombuffer(ean_code[:12].encode('ascii'), dtype=np.uint8) - ord('0')
+    left = digits[1:7]
+    right = np.append(digits[7:12], _ean13_check_digit(digits))
     
-    # Generate barcode in memory
-    buffer = BytesIO()
-    ean.write(buffer, options={
-        'write_text': False,  # We'll add text separately
-        'module_height': 8,
-        'module_width': 0.2,
-        'quiet_zone': 2,
-    })
+    # The first digit is encoded in the L/G parity of the left half
+    left_bits = np.where(_EAN_PARITY[digits[0]][:, None], _EAN_G[left], _EAN_L[left])
+    bits = np.concatenate((_EAN_GUARD, left_bits.ravel(), _EAN_CENTER, _EAN_R[right].ravel(), _EAN_GUARD))
     
-    buffer.seek(0)
-    barcode_img = Image.open(buffer)
+    # Widen modules to pixels, pad with quiet zones and stretch vertically
+    row = np.repeat(bits, module_px)
+    quiet = (width_px - row.size) // 2
+    row = np.pad(row, (quiet, width_px - row.size - quiet))
+    pixels = np.broadcast_to((1 - row) * 255, (height_px, width_px))
     
-    return barcode_img
+    return Image.fromarray(np.ascontiguousarray(pixels, dtype=np.uint8))
 
 
 def create_label(ean_code, price_minor_units, output_file='label.png', language='world', price_format='${price}', 
-                 custom_name=None, custom_producer=None):
+                 custom_name=None, custom_producer=None, png_level=1):
     """
     Create a product label with specified dimensions and layout
     
@@ -102,17 +533,8 @@ def create_label(ean_code, price_minor_units, output_file='label.png', language=
         price_format: Template for formatting the price
         custom_name: Override product name from API
         custom_producer: Override producer from API
+        png_level: zlib compression level for the PNG (0-9)
     """
-    # Specifications
-    DPI = 8  # dots per mm
-    HEIGHT_MM = 48
-    PADDING_LEFT_MM = 5
-    
-    # Convert mm to pixels
-    height_px = int(HEIGHT_MM * DPI)
-    padding_left_px = int(PADDING_LEFT_MM * DPI)
-    padding_internal = int(3 * DPI)  # 3mm internal padding
-    
     # Fetch product info or use custom data
     if custom_name and custom_producer:
         product_info = {
@@ -128,106 +550,298 @@ def create_label(ean_code, price_minor_units, output_file='label.png', language=
         if custom_producer:
             product_info['producer'] = custom_producer
     
-    # Format price
-    price_text = format_price(price_minor_units, price_format)
+    price_text = compile_price_format(price_format)(price_minor_units)
+    img = _render_label(product_info, price_text)
+    _report_saved(output_file, _save_label(img, output_file, png_level))
+
+
+def _resolve_items(items, language='world'):
+    """Resolve product info for label items with a single batch lookup
+
+    Returns:
+        List of product info dicts in the same order as `items`
+    """
+    # Only look up products that are not fully overridden
+    lookup = [item['ean_code'] for item in items
+              if not (item.get('custom_name') and item.get('custom_producer'))]
+    products = fetch_product_infos(lookup, language) if lookup else {}
+    
+    resolved = []
+    for item in items:
+        ean_code = item['ean_code']
+        product_info = dict(products.get(ean_code) or _product_info({}, ean_code))
+        # Allow partial override
+        if item.get('custom_name'):
+            product_info['name'] = item['custom_name']
+        if item.get('custom_producer'):
+            product_info['producer'] = item['custom_producer']
+        resolved.append(product_info)
     
-    # Generate barcode
-    barcode_img = generate_barcode_image(ean_code)
+    return resolved
+
+
+def create_labels(items, language='world', price_format='${price}', png_level=1):
+    """
+    Create several product labels, looking up all products in one request
     
-    # Create initial image to calculate left side width
-    # We'll use a large temporary canvas
-    temp_img = Image.new('RGB', (2000, height_px), 'white')
-    draw = ImageDraw.Draw(temp_img)
+    Args:
+        items: Iterable of dicts with keys 'ean_code', 'price_minor_units',
+            'output_file' and optionally 'custom_name', 'custom_producer'
+        language: Language or domain prefix for product lookup (e.g., 'en', 'pl', 'world')
+        price_format: Template for formatting the price
+        png_level: zlib compression level for the PNGs (0-9)
+    """
+    items = list(items)
+    price_text = compile_price_format(price_format)
+    price_texts = [price_text(item['price_minor_units']) for item in items]
     
-    # Try to load fonts, fallback to default if not available
+    # PNG encoding runs in the background while the next label is laid out
+    pending = []
     try:
-        # Large font for left side text
-        font_large = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", int(5 * DPI))
-        # Very large font for price
-        font_price = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", int(12 * DPI))
-    except:
-        try:
-            font_large = ImageFont.truetype("arial.ttf", int(5 * DPI))
-            font_price = ImageFont.truetype("arial.ttf", int(12 * DPI))
-        except:
-            font_large = ImageFont.load_default()
-            font_price = ImageFont.load_default()
+        for item, product_info, price_text in zip(items, _resolve_items(items, language), price_texts):
+            if len(pending) >= _MAX_PENDING_SAVES:
+                # Saves finish in order, so this caps the images in flight
+                wait([pending[-_MAX_PENDING_SAVES][1]])
+            img = _render_label(product_info, price_text)
+            pending.append((item['output_file'], _save_label(img, item['output_file'], png_level, batch=True)))
+    except Exception:
+        # Saves already queued still finish and are reported before the
+        # render error propagates
+        _wait_saved(pending, raise_on_error=False)
+        raise
+    
+    _wait_saved(pending)
+
+
+def create_labels_parallel(items, workers=8, language='world', price_format='${price}', png_level=1):
+    """
+    Create several product labels, rendering and saving them on a thread pool
     
-    # Calculate left side layout
-    y_offset = padding_internal
+    Products are looked up in one request first. Barcode rendering, text
+    drawing and PNG encoding mostly run inside Pillow's C code, so threads
+    are enough to spread the work over several cores.
+    
+    Args:
+        items: Iterable of dicts, see create_labels()
+        workers: Number of worker threads
+        language: Language or domain prefix for product lookup (e.g., 'en', 'pl', 'world')
+        price_format: Template for formatting the price
+        png_level: zlib compression level for the PNGs (0-9)
+    """
+    items = list(items)
+    product_infos = _resolve_items(items, language)
+    price_text = compile_price_format(price_format)
+    price_texts = [price_text(item['price_minor_units']) for item in items]
+    
+    def job(item, product_info, price_text):
+        img = _render_label(product_info, price_text)
+        return _save_label(img, item['output_file'], png_level)
+    
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = [(item['output_file'], executor.submit(job, item, product_info, price_text))
+                   for item, product_info, price_text in zip(items, product_infos, price_texts)]
+        # Report from this thread so output of concurrent saves doesn't interleave
+        _wait_saved(pending)
+
+
+@functools.lru_cache(maxsize=32)
+def _load_font(size):
+    """Load the label font at the given pixel size
+
+    Uses _FONT_PATH, picked once at import, and falls back to Pillow's
+    default font. Results are cached, so fonts are only parsed once per size.
+    """
+    if _FONT_PATH is None:
+        return ImageFont.load_default()
+    return ImageFont.truetype(_FONT_PATH, size)
+
+
+def _acquire_canvas(size):
+    """Return a white 'L' image of the given size, reusing a released one
+
+    Labels of the same geometry share a few buffers instead of allocating
+    a fresh image each time; clearing a reused one is a single fill.
+    """
+    img = None
+    with _CANVAS_LOCK:
+        # Newest first; compare sizes only, Image.__eq__ compares pixels
+        for index in range(len(_CANVASES) - 1, -1, -1):
+            if _CANVASES[index].size == size:
+                img = _CANVASES[index]
+                del _CANVASES[index]
+                break
+    
+    if img is None:
+        return Image.new('L', size, 255)
+    img.paste(255, (0, 0) + size)
+    return img
+
+
+def _release_canvas(img):
+    """Give a label image back to the pool used by _acquire_canvas()"""
+    with _CANVAS_LOCK:
+        _CANVASES.append(img)
+
+
+@functools.lru_cache(maxsize=512)
+def _glyph(font, char):
+    """Rasterize a single character once for _draw_glyphs()
+
+    Returns:
+        Tuple of (mask image, (x, y) offset of the mask, advance width)
+    """
+    left, top, right, bottom = font.getbbox(char)
+    x_offset, y_offset = min(0, left), min(0, top)
+    mask = Image.new('L', (max(1, right - x_offset), max(1, bottom - y_offset)), 0)
+    ImageDraw.Draw(mask).text((-x_offset, -y_offset), char, fill=255, font=font)
+    return mask, (x_offset, y_offset), font.getlength(char)
+
+
+def _draw_glyphs(img, xy, text, font, fill=0):
+    """Draw text by stamping cached glyph masks instead of rasterizing it
+
+    Positions match ImageDraw.text() with the default anchor. Kerning is not
+    applied, so this is meant for short strings from a small alphabet like
+    prices and EAN codes.
+    """
+    x, y = xy
+    for char in text:
+        mask, (x_offset, y_offset), advance = _glyph(font, char)
+        img.paste(fill, (round(x) + x_offset, y + y_offset), mask)
+        x += advance
+
+
+def _render_label(product_info, price_text):
+    """Render a label for already resolved product info and formatted price
+
+    Returns:
+        PIL Image object containing the label
+    """
+    ean_code = product_info['ean']
+    
+    # Large font for left side text
+    font_large = _load_font(_FONT_LARGE_PX)
+    # Very large font for price
+    font_price = _load_font(_FONT_PRICE_PX)
     
     # Product name
-    name_bbox = draw.textbbox((0, 0), product_info['name'], font=font_large)
+    name_bbox = font_large.getbbox(product_info['name'])
     name_width = name_bbox[2] - name_bbox[0]
     name_height = name_bbox[3] - name_bbox[1]
-    y_offset += name_height + int(1 * DPI)
     
     # Producer
-    producer_bbox = draw.textbbox((0, 0), product_info['producer'], font=font_large)
+    producer_bbox = font_large.getbbox(product_info['producer'])
     producer_width = producer_bbox[2] - producer_bbox[0]
     producer_height = producer_bbox[3] - producer_bbox[1]
-    y_offset += producer_height + int(1 * DPI)
     
     # EAN text
     ean_text = f"EAN: {ean_code}"
-    ean_bbox = draw.textbbox((0, 0), ean_text, font=font_large)
+    ean_bbox = font_large.getbbox(ean_text)
     ean_width = ean_bbox[2] - ean_bbox[0]
     ean_height = ean_bbox[3] - ean_bbox[1]
-    y_offset += ean_height + int(1 * DPI)
     
-    # Barcode (resize to fit)
-    barcode_width = int(30 * DPI)  # 30mm wide
-    barcode_height = int(10 * DPI)  # 10mm tall
-    barcode_img = barcode_img.resize((barcode_width, barcode_height), Image.Resampling.LANCZOS)
+    # Barcode (rendered at its final size)
+    barcode_img = generate_barcode_image(ean_code, _BARCODE_WIDTH_PX, _BARCODE_HEIGHT_PX)
     
     # Calculate left side width
-    left_width = max(name_width, producer_width, ean_width, barcode_width) + padding_internal * 2
+    left_width = max(name_width, producer_width, ean_width, _BARCODE_WIDTH_PX) + _PADDING_PX * 2
     
     # Calculate right side (price)
-    price_bbox = draw.textbbox((0, 0), price_text, font=font_price)
+    price_bbox = font_price.getbbox(price_text)
     price_width = price_bbox[2] - price_bbox[0]
     price_height = price_bbox[3] - price_bbox[1]
-    right_width = price_width + padding_internal * 2
+    right_width = price_width + _PADDING_PX * 2
     
     # Total width
-    total_width = padding_left_px + left_width + right_width
+    total_width = _PADDING_LEFT_PX + left_width + right_width
     
-    # Create final image
-    img = Image.new('RGB', (total_width, height_px), 'white')
+    # Create final image (grayscale, the label has no color)
+    img = _acquire_canvas((total_width, _HEIGHT_PX))
     draw = ImageDraw.Draw(img)
     
     # Draw left side content
-    x_left = padding_left_px + padding_internal
-    y_pos = padding_internal
+    x_left = _PADDING_LEFT_PX + _PADDING_PX
+    y_pos = _PADDING_PX
     
     # Draw name
-    draw.text((x_left, y_pos), product_info['name'], fill='black', font=font_large)
-    y_pos += name_height + int(1 * DPI)
+    draw.text((x_left, y_pos), product_info['name'], fill=0, font=font_large)
+    y_pos += name_height + _LINE_GAP_PX
     
     # Draw producer
-    draw.text((x_left, y_pos), product_info['producer'], fill='black', font=font_large)
-    y_pos += producer_height + int(1 * DPI)
+    draw.text((x_left, y_pos), product_info['producer'], fill=0, font=font_large)
+    y_pos += producer_height + _LINE_GAP_PX
     
     # Draw EAN
-    draw.text((x_left, y_pos), ean_text, fill='black', font=font_large)
-    y_pos += ean_height + int(1 * DPI)
+    _draw_glyphs(img, (x_left, y_pos), ean_text, font_large)
+    y_pos += ean_height + _LINE_GAP_PX
     
     # Draw barcode
     img.paste(barcode_img, (x_left, y_pos))
     
     # Draw right side (price) - centered vertically
-    x_price = padding_left_px + left_width + padding_internal
-    y_price = (height_px - price_height) // 2
-    draw.text((x_price, y_price), price_text, fill='black', font=font_price)
+    x_price = _PADDING_LEFT_PX + left_width + _PADDING_PX
+    y_price = (_HEIGHT_PX - price_height) // 2
+    _draw_glyphs(img, (x_price, y_price), price_text, font_price)
     
-    # Draw vertical separator line
-    separator_x = padding_left_px + left_width
-    draw.line([(separator_x, 0), (separator_x, height_px)], fill='black', width=2)
+    # Draw vertical separator line (2px wide, a plain fill is enough)
+    separator_x = _PADDING_LEFT_PX + left_width
+    img.paste(0, (separator_x, 0, separator_x + 2, _HEIGHT_PX))
     
-    # Save the image
-    img.save(output_file, dpi=(DPI * 25.4, DPI * 25.4))  # Convert dots/mm to dots/inch
-    print(f"Label saved to {output_file}")
-    print(f"Dimensions: {total_width}x{height_px} pixels ({total_width/DPI:.1f}x{height_px/DPI:.1f}mm)")
+    return img
+
+
+def _save_label(img, output_file, png_level=1, batch=False):
+    """Save a rendered label as PNG with the printer resolution
+
+    The default zlib level 1 encodes several times faster than Pillow's
+    default of 6 for a slightly larger file.
+
+    Returns the label size in pixels. With batch=True the save is queued on
+    _SAVE_POOL and a Future of the size is returned instead, so the caller
+    can render the next label meanwhile.
+
+    The image is handed back to the canvas pool afterwards, so it must not
+    be used once this returns (or the Future completes).
+    """
+    if batch:
+        return _SAVE_POOL.submit(_save_label, img, output_file, png_level)
+    
+    size = img.size
+    try:
+        img.save(output_file, format='PNG', dpi=(DPI * 25.4, DPI * 25.4),  # Convert dots/mm to dots/inch
+                 compress_level=png_level)
+    finally:
+        _release_canvas(img)
+    return size
+
+
+def _report_saved(output_file, size):
+    """Print where a label was saved and its dimensions"""
+    width, height = size
+    print(f"Label saved to {output_file}\n"
+          f"Dimensions: {width}x{height} pixels ({width/DPI:.1f}x{height/DPI:.1f}mm)")
+
+
+def _wait_saved(pending, raise_on_error=True):
+    """Wait for queued label saves and report them in order
+
+    Every save is waited for, so none is left running or silently failing.
+
+    Args:
+        pending: List of (output_file, Future) pairs, each Future resolving
+            to the label size returned by _save_label()
+        raise_on_error: Raise once all saves are done if any of them failed
+    """
+    failed = 0
+    for output_file, future in pending:
+        try:
+            _report_saved(output_file, future.result())
+        except Exception as e:
+            print(f"Error: Failed to save {output_file}: {e}")
+            failed += 1
+    
+    if failed and raise_on_error:
+        raise Exception(f"Failed to save {failed} label(s)")
 
 def main():
     parser = argparse.ArgumentParser(
@@ -237,17 +851,26 @@ def main():
 Examples:
   %(prog)s 5449000000996 299 -o cola_label.png
   %(prog)s 3017620422003 150
+  %(prog)s --batch labels.txt
         """
     )
     
-    parser.add_argument('ean', type=str, help='EAN-13 barcode (13 digits)')
-    parser.add_argument('price', type=int, help='Price in minor currency units (e.g., 100 for $1.00)')
-    parser.add_argument('-o', '--output', type=str, default='label.png',
+    parser.add_argument('ean', type=str, nargs='?', help='EAN-13 barcode (13 digits)')
+    parser.add_argument('price', type=int, nargs='?', help='Price in minor currency units (e.g., 100 for $1.00)')
+    parser.add_argument('-b', '--batch', type=argparse.FileType('r'), default=None,
+                        help="File with one 'EAN PRICE [OUTPUT]' per line ('-' for stdin); "
+                             "all products are looked up in a single request")
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='Number of threads used to render --batch labels (default: 1)')
+    parser.add_argument('-o', '--output', type=str, default=None,
                         help='Output PNG filename (default: label.png)')
     parser.add_argument('-l', '--lang', type=str, default='world',
                         help='Language code or domain prefix for Open Food Facts (e.g., en, pl, world)')
     parser.add_argument('--price-format', dest='price_format', type=str, default='${price}',
                         help="Price format template using placeholders {maj}, {min}, {price} (default '${price}')")
+    parser.add_argument('--png-level', dest='png_level', type=int, default=1, choices=range(10),
+                        metavar='{0..9}',
+                        help='PNG zlib compression level; higher is smaller but slower (default: 1)')
     parser.add_argument('--name', type=str, default=None,
                         help='Override product name from API')
     parser.add_argument('--producer', type=str, default=None,
@@ -255,17 +878,64 @@ Examples:
     
     args = parser.parse_args()
     
+    # Compile the price format once up front, which also rejects bad templates
+    try:
+        compile_price_format(args.price_format)(0)
+    except Exception as e:
+        parser.error(f"Invalid price format: {e!r}")
+    
+    if args.batch:
+        if args.ean is not None or args.price is not None:
+            parser.error("EAN and price arguments cannot be combined with --batch")
+        if args.output is not None or args.name is not None or args.producer is not None:
+            parser.error("--output, --name and --producer cannot be combined with --batch")
+        if args.workers is not None and args.workers < 1:
+            parser.error("--workers must be at least 1")
+        
+        items = []
+        for line_no, line in enumerate(args.batch, 1):
+            fields = line.split()
+            if not fields or fields[0].startswith('#'):
+                continue
+            if len(fields) not in (2, 3) or not _PRICE_RE.fullmatch(fields[1]):
+                parser.error(f"{args.batch.name}:{line_no}: expected 'EAN PRICE [OUTPUT]'")
+            ean, price = fields[0], int(fields[1])
+            if not is_valid_ean13(ean):
+                parser.error(f"{args.batch.name}:{line_no}: EAN must be 13 digits with a valid check digit")
+            items.append({
+                'ean_code': ean,
+                'price_minor_units': price,
+                'output_file': fields[2] if len(fields) == 3 else f"label_{ean}.png",
+            })
+        
+        try:
+            if args.workers is not None and args.workers > 1:
+                create_labels_parallel(items, args.workers, args.lang, price_format=args.price_format,
+                                       png_level=args.png_level)
+            else:
+                create_labels(items, args.lang, price_format=args.price_format, png_level=args.png_level)
+        except Exception as e:
+            print(f"Error: {e}")
+            return 1
+        
+        return 0
+    
+    if args.ean is None or args.price is None:
+        parser.error("EAN and price are required unless --batch is given")
+    if args.workers is not None:
+        parser.error("--workers can only be used with --batch")
+    
     # Validate EAN
-    if not args.ean.isdigit() or len(args.ean) != 13:
-        parser.error("EAN must be exactly 13 digits")
+    if not is_valid_ean13(args.ean):
+        parser.error("EAN must be 13 digits with a valid check digit")
     
     # Validate price
     if args.price < 0:
         parser.error("Price must be non-negative")
     
     try:
-        create_label(args.ean, args.price, args.output, args.lang, price_format=args.price_format,
-                    custom_name=args.name, custom_producer=args.producer)
+        create_label(args.ean, args.price, args.output or 'label.png', args.lang, price_format=args.price_format,
+                    custom_name=args.name, custom_producer=args.producer, png_level=args.png_level)
     except Exception as e:
         print(f"Error: {e}")
         return 1